@@ -0,0 +1,209 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import timing
+from api_client import DEFAULT_CONCURRENCY, BookingClient
+from cache import SqliteCache
+from changes import PriceIndex, write_changes
+from listings import get_all_properties
+from sinks import SINKS, open_sink
+
+Job = namedtuple('Job', ['address', 'lat', 'lng', 'checkin', 'checkout'])
+
+CHECKPOINT_NAME = 'checkpoint.jsonl'
+
+# One pooled client (plus optional response cache and price index) per worker process, shared by every job that worker runs
+_worker_client = None
+_worker_cache = None
+_worker_index = None
+
+def load_manifest(path):
+    #Reads jobs from a CSV (address,lat,lng,checkin,checkout header) or a JSONL file with the same keys
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            records = [json.loads(line) for line in f if line.strip()]
+        else:
+            records = list(csv.DictReader(f))
+
+    jobs = []
+    for record in records:
+        lat, lng = record.get('lat'), record.get('lng')
+        jobs.append(Job(
+            record['address'],
+            float(lat) if lat not in (None, '') else None,
+            float(lng) if lng not in (None, '') else None,
+            record['checkin'],
+            record['checkout'],
+        ))
+    return jobs
+
+def job_id(job):
+    # Stable across runs and manifest reordering, so the checkpoint can be matched on restart
+    return hashlib.sha1(json.dumps(list(job)).encode('utf-8')).hexdigest()[:16]
+
+def load_checkpoint(path):
+    #Returns the ids of jobs that already finished in a previous run
+    if not os.path.exists(path):
+        return set()
+    done = set()
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)['job'])
+            except (ValueError, KeyError):
+                continue  # a line cut short by a crash
+    return done
+
+def init_worker(concurrency, cache_path=None, changes_path=None, timing_enabled=False):
+    global _worker_client, _worker_cache, _worker_index
+    if timing_enabled:
+        timing.enable()
+    _worker_client = BookingClient(pool_size=concurrency)
+    _worker_cache = SqliteCache(cache_path) if cache_path else None
+    _worker_index = PriceIndex(changes_path) if changes_path else None
+
+def close_worker():
+    global _worker_client, _worker_cache, _worker_index
+    for resource in (_worker_client, _worker_cache, _worker_index):
+        if resource is not None:
+            resource.close()
+    _worker_client = _worker_cache = _worker_index = None
+
+def run_key(out_dir):
+    # One output directory is one run, so the price index can tell this run's deliveries from earlier ones
+    return os.path.realpath(out_dir)
+
+def run_job(job, out_dir, page_size, concurrency, rate_limit=None, trimmed=False, fmt='csv', stream=False):
+    #Fetches every page for one job and writes it to <out_dir>/<job id>.<fmt>, or only the
+    #differences from the previous crawl to <out_dir>/<job id>.changes.jsonl when a price index is open
+    jid = job_id(job)
+    if _worker_index is not None:
+        delivered = _worker_index.delivered(run_key(out_dir)).get(jid)
+        if delivered is not None:
+            # Committed by this run already (only the checkpoint line was lost); diffing again would
+            # come back empty and overwrite the changes file that was delivered
+            return jid, delivered, timing.drain()
+
+    rows = get_all_properties(
+        job.address, page_size, job.lat, job.lng,
+        concurrency=concurrency, rate_limit=rate_limit, client=_worker_client, trimmed=trimmed,
+        checkIn=job.checkin, checkOut=job.checkout, cache=_worker_cache, stream=stream,
+    )
+    if _worker_index is not None:
+        path = os.path.join(out_dir, f'{jid}.changes.jsonl')
+        tmp_path = path + '.part'
+        # The job id covers address and dates, so removals are only reported for the same search.
+        # The price updates and the delivery record are committed together once the changes file
+        # is in place, so a failed job is diffed again on rerun and a delivered one never is
+        try:
+            count = write_changes(_worker_index.diff(rows, scope=jid), tmp_path, append=False)
+            os.replace(tmp_path, path)
+            _worker_index.mark_delivered(run_key(out_dir), jid, count)
+        except BaseException:
+            _worker_index.rollback()
+            raise
+        _worker_index.commit()
+    else:
+        path = os.path.join(out_dir, f'{jid}.{fmt}')
+        tmp_path = path + '.part'
+        with open_sink(tmp_path, fmt, append=False) as sink:
+            sink.write_rows(rows)
+        count = len(rows)
+        os.replace(tmp_path, path)
+    # Stage timings travel back with the result since each worker process keeps its own
+    return jid, count, timing.drain()
+
+def run_batch(manifest, out_dir, workers=os.cpu_count(), page_size=100, concurrency=DEFAULT_CONCURRENCY, rate_limit=None, trimmed=False,
+              fmt='csv', cache_path=None, changes_path=None, timing_enabled=False, stream=False):
+    #Runs every manifest job not already in the checkpoint, spread over worker processes.
+    #workers=0 runs the jobs in the current process, which is handy for debugging.
+    #rate_limit is the total requests per second to the host, split evenly across workers
+    os.makedirs(out_dir, exist_ok=True)
+    checkpoint_path = os.path.join(out_dir, CHECKPOINT_NAME)
+    done = load_checkpoint(checkpoint_path)
+    jobs = load_manifest(manifest)
+    delivered = {}
+    if changes_path:
+        # Jobs whose diff was committed but whose checkpoint line never got written
+        index = PriceIndex(changes_path)
+        try:
+            delivered = {jid: count for jid, count in index.delivered(run_key(out_dir)).items() if jid not in done}
+        finally:
+            index.close()
+    pending = [job for job in jobs if job_id(job) not in done and job_id(job) not in delivered]
+    summary = {'skipped': len(jobs) - len(pending), 'completed': 0, 'failed': 0}
+    if rate_limit:
+        # Each worker process has its own limiter, so they share the overall budget evenly
+        rate_limit = rate_limit / max(1, workers)
+    args = (out_dir, page_size, concurrency, rate_limit, trimmed, fmt, stream)
+
+    with open(checkpoint_path, 'a', encoding='utf-8') as checkpoint:
+        def mark_done(job, jid, count):
+            checkpoint.write(json.dumps({'job': jid, 'address': job.address, 'checkin': job.checkin, 'rows': count}) + '\n')
+            checkpoint.flush()
+
+        def record(job, result):
+            jid, count, timings = result
+            timing.merge(timings)
+            mark_done(job, jid, count)
+            summary['completed'] += 1
+
+        for job in jobs:
+            if job_id(job) in delivered:
+                mark_done(job, job_id(job), delivered.pop(job_id(job)))
+
+        if not workers:
+            init_worker(concurrency, cache_path, changes_path, timing_enabled)
+            try:
+                for job in pending:
+                    try:
+                        record(job, run_job(job, *args))
+                    except Exception as e:
+                        print(f'Job {job_id(job)} ({job.address}) failed: {e}')
+                        summary['failed'] += 1
+            finally:
+                close_worker()
+            return summary
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(concurrency, cache_path, changes_path, timing_enabled)) as pool:
+            futures = {pool.submit(run_job, job, *args): job for job in pending}
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    record(job, future.result())
+                except Exception as e:
+                    print(f'Job {job_id(job)} ({job.address}) failed: {e}')
+                    summary['failed'] += 1
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Crawl a manifest of location x date jobs in parallel')
+    parser.add_argument('manifest', help='CSV or JSONL file with address, lat, lng, checkin, checkout')
+    parser.add_argument('-o', '--out-dir', default='output', help='directory for per-job results and the checkpoint')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help='worker processes (0 = run in this process)')
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help='parallel requests per worker')
+    parser.add_argument('--rate-limit', type=float, default=None, help='max requests per second in total, split evenly across workers')
+    parser.add_argument('--trimmed', action='store_true', help='only request the fields that are written out')
+    parser.add_argument('--stream', action='store_true', help='parse pages as they download instead of decoding whole responses')
+    parser.add_argument('--format', choices=sorted(SINKS), default='csv', help='per-job output format')
+    parser.add_argument('--cache', dest='cache_path', default=None, help='SQLite file for caching responses between runs')
+    parser.add_argument('--changes-db', dest='changes_path', default=None,
+                        help='SQLite price index; only new, repriced and removed listings are written')
+    parser.add_argument('--timing', action='store_true', help='print per-stage latency histograms at the end')
+    args = parser.parse_args(argv)
+
+    summary = run_batch(args.manifest, args.out_dir, args.workers, args.page_size, args.concurrency, args.rate_limit, args.trimmed,
+                        args.format, args.cache_path, args.changes_path, args.timing, args.stream)
+    print(f"Completed {summary['completed']} jobs, skipped {summary['skipped']} already done, {summary['failed']} failed")
+    if args.timing:
+        print(timing.report())
+    return 1 if summary['failed'] else 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
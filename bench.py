@@ -0,0 +1,105 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+
+import timing
+from api_client import BookingClient, build_search_body, fetch_from_api, get_payload_builder
+from listings import CHECK_IN, CHECK_OUT, extract_listing_data, get_all_properties, iter_listing_rows, save_to_csv
+from mock_server import MockBookingServer, make_response
+from sinks import open_sink
+
+PAGE_SIZES = (25, 100, 500)
+CONCURRENCY_LEVELS = (1, 4, 16)
+
+def measure(func, repeat=5, min_time=0.2):
+    #Best-of-`repeat` seconds per call, each round looping until it has run for at least min_time
+    best = float('inf')
+    for _ in range(repeat):
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            func()
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        best = min(best, elapsed / calls)
+    return best
+
+def bench_build(results):
+    full, trimmed = get_payload_builder(), get_payload_builder(trimmed=True)
+    results.append(('build', 'build_search_body + json.dumps', measure(lambda: json.dumps(build_search_body('Dubai', 100, CHECK_IN, CHECK_OUT)))))
+    results.append(('build', 'SearchPayloadBuilder', measure(lambda: full.build('Dubai', 100, CHECK_IN, CHECK_OUT))))
+    results.append(('build', 'SearchPayloadBuilder trimmed', measure(lambda: trimmed.build('Dubai', 100, CHECK_IN, CHECK_OUT))))
+
+def bench_extract(results, padding):
+    for page_size in PAGE_SIZES:
+        body = make_response(0, page_size, page_size, padding)
+        raw = json.dumps(body).encode('utf-8')
+        results.append(('extract', f'extract_listing_data page={page_size}', measure(lambda: extract_listing_data(body))))
+        results.append(('extract', f'json.loads + extract page={page_size}', measure(lambda: extract_listing_data(json.loads(raw)))))
+        results.append(('extract', f'iter_listing_rows page={page_size}', measure(lambda: list(iter_listing_rows(io.BytesIO(raw))))))
+
+def bench_write(results, tmp_dir):
+    rows = extract_listing_data(make_response(0, 5000, 5000))
+    path = os.path.join(tmp_dir, 'bench')
+
+    def sink_writer(ext):
+        def write():
+            with open_sink(f'{path}.{ext}', append=False) as sink:
+                sink.write_rows(rows)
+        return write
+
+    with contextlib.redirect_stdout(io.StringIO()):  # save_to_csv reports every call
+        results.append(('write', 'save_to_csv 5000 rows', measure(lambda: save_to_csv(rows, f'{path}.csv'), repeat=3)))
+    results.append(('write', 'JsonlSink 5000 rows', measure(sink_writer('jsonl'), repeat=3)))
+    try:
+        results.append(('write', 'ParquetSink 5000 rows', measure(sink_writer('parquet'), repeat=3)))
+    except ImportError:
+        pass
+
+def bench_fetch(results, padding):
+    for page_size in PAGE_SIZES:
+        with MockBookingServer(total_results=page_size, padding=padding) as server, BookingClient(headers={}) as client:
+            payload = get_payload_builder().build('Dubai', page_size, CHECK_IN, CHECK_OUT)
+            results.append(('fetch', f'fetch_from_api page={page_size}', measure(lambda: fetch_from_api(server.url, None, payload, client=client))))
+
+def bench_crawl(results, latency, padding):
+    for concurrency in CONCURRENCY_LEVELS:
+        with MockBookingServer(total_results=1000, latency=latency, padding=padding) as server:
+            run = lambda: get_all_properties('Dubai', 50, concurrency=concurrency, url=server.url)
+            results.append(('crawl', f'get_all_properties 20 pages concurrency={concurrency}', measure(run, repeat=2, min_time=0)))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the search hot paths against the local mock server')
+    parser.add_argument('--latency', type=float, default=0.05, help='mock server latency per request for the crawl benchmark')
+    parser.add_argument('--padding', type=int, default=5, help='unused blocks per mock result')
+    parser.add_argument('--only', choices=['build', 'extract', 'write', 'fetch', 'crawl'], action='append')
+    args = parser.parse_args(argv)
+    only = set(args.only or ['build', 'extract', 'write', 'fetch', 'crawl'])
+
+    results = []
+    timing.enable()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if 'build' in only:
+            bench_build(results)
+        if 'extract' in only:
+            bench_extract(results, args.padding)
+        if 'write' in only:
+            bench_write(results, tmp_dir)
+        if 'fetch' in only:
+            bench_fetch(results, args.padding)
+        if 'crawl' in only:
+            bench_crawl(results, args.latency, args.padding)
+
+    for group, name, seconds in results:
+        print(f'{group:<8}{name:<52}{seconds * 1000:>12.3f} ms')
+    print()
+    print(timing.report())
+
+if __name__ == '__main__':
+    main()
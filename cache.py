@@ -0,0 +1,130 @@
+import functools
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL = 3600  # seconds, prices rarely move within the hour
+DEFAULT_MAX_ENTRIES = 1024
+
+@functools.lru_cache(maxsize=16)
+def query_digest(query):
+    # There are only a couple of distinct query texts, so each ~30KB string is hashed once
+    return hashlib.sha1(query.encode('utf-8')).hexdigest()
+
+def cache_key(payload):
+    #Canonical hash of the parts of a search payload that change between requests:
+    #location, dates, pagination and filters, plus a digest of the query text.
+    #Builder payloads carry those parts alongside their bytes, so the body is never parsed back
+    search_input = getattr(payload, 'search_input', None)
+    if search_input is not None:
+        return search_key(payload.query_digest, search_input)
+    if isinstance(payload, (bytes, bytearray)):
+        # Bytes from elsewhere have no canonical form to recover cheaply, so the body itself is the key
+        return hashlib.sha256(payload).hexdigest()
+    return search_key(query_digest(payload.get('query', '')), payload['variables']['input'])
+
+def search_key(digest, search_input):
+    location = dict(search_input.get('location') or {})
+    for field in ('latitude', 'longitude'):
+        if isinstance(location.get(field), float):
+            location[field] = round(location[field], 6)
+    material = {
+        'query': digest,
+        'location': location,
+        'dates': search_input.get('dates'),
+        'pagination': search_input.get('pagination'),
+        'filters': search_input.get('filters'),
+    }
+    return hashlib.sha256(json.dumps(material, sort_keys=True, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+class MemoryCache:
+    #In-process LRU cache with a per-entry TTL
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = self.misses = self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'entries': len(self._entries)}
+
+class SqliteCache:
+    #On-disk cache that survives restarts and can be shared by worker processes.
+    #Entries expire after their TTL; past max_entries the least recently used are dropped
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES * 10, ttl=DEFAULT_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = self.misses = self.evictions = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS responses '
+            '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)')
+        self._db.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute('SELECT value, expires_at FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None or row[1] < now:
+                if row is not None:
+                    self._db.execute('DELETE FROM responses WHERE key = ?', (key,))
+                    self._db.commit()
+                self.misses += 1
+                return None
+            self._db.execute('UPDATE responses SET last_used = ? WHERE key = ?', (now, key))
+            self._db.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO responses (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)',
+                (key, json.dumps(value, separators=(',', ':')), expires_at, now),
+            )
+            excess = self._db.execute('SELECT COUNT(*) FROM responses').fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._db.execute(
+                    'DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used LIMIT ?)', (excess,)
+                )
+                self.evictions += excess
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._db.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'entries': entries}
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,102 @@
+import json
+import sqlite3
+from collections import namedtuple
+
+NEW = 'new'
+REPRICED = 'repriced'
+REMOVED = 'removed'
+
+Change = namedtuple('Change', ['kind', 'listing_id', 'title', 'page_name', 'amount', 'previous_amount'])
+
+class PriceIndex:
+    #Last seen price per listing id, kept in SQLite so each crawl can be compared with the previous one.
+    #Listings are grouped by scope (a city, a batch job...) so removals are only reported within one search
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=30)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS prices '
+            '(scope TEXT NOT NULL, listing_id TEXT NOT NULL, amount TEXT, title TEXT, page_name TEXT, '
+            'PRIMARY KEY (scope, listing_id)) WITHOUT ROWID'
+        )
+        # Scopes whose diff has been delivered in a run, committed together with the price updates
+        # so a rerun can tell a delivered diff from one that still has to be made
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS deliveries '
+            '(run TEXT NOT NULL, scope TEXT NOT NULL, changes INTEGER NOT NULL, '
+            'PRIMARY KEY (run, scope)) WITHOUT ROWID'
+        )
+        self._db.commit()
+
+    def diff(self, rows, scope='default'):
+        #Yields a Change for every new or repriced listing as rows stream in, then one for each
+        #listing that was in the index but not in this crawl. Unchanged listings yield nothing.
+        #Removals are only reported once the rows are exhausted, never for a partial crawl.
+        #Updates are left uncommitted: call commit() once the changes are safely written, and
+        #anything that stops the diff early (an error, or closing the generator) rolls them back
+        seen = set()
+        try:
+            for row in rows:
+                if row.id == 'N/A':
+                    continue
+                listing_id = str(row.id)
+                if listing_id in seen:
+                    continue
+                seen.add(listing_id)
+
+                previous = self._db.execute(
+                    'SELECT amount FROM prices WHERE scope = ? AND listing_id = ?', (scope, listing_id)
+                ).fetchone()
+                if previous is not None and previous[0] == row.amount:
+                    continue
+                self._db.execute(
+                    'INSERT OR REPLACE INTO prices (scope, listing_id, amount, title, page_name) VALUES (?, ?, ?, ?, ?)',
+                    (scope, listing_id, row.amount, row.title, row.page_name),
+                )
+                if previous is None:
+                    yield Change(NEW, row.id, row.title, row.page_name, row.amount, None)
+                else:
+                    yield Change(REPRICED, row.id, row.title, row.page_name, row.amount, previous[0])
+
+            stored = self._db.execute(
+                'SELECT listing_id, amount, title, page_name FROM prices WHERE scope = ?', (scope,)
+            ).fetchall()
+            for listing_id, amount, title, page_name in stored:
+                if listing_id not in seen:
+                    self._db.execute('DELETE FROM prices WHERE scope = ? AND listing_id = ?', (scope, listing_id))
+                    yield Change(REMOVED, int(listing_id) if listing_id.isdigit() else listing_id, title, page_name, None, amount)
+        except BaseException:
+            self._db.rollback()
+            raise
+
+    def mark_delivered(self, run, scope, changes):
+        # Part of the pending transaction, so it only sticks if the diff is committed with it
+        self._db.execute(
+            'INSERT OR REPLACE INTO deliveries (run, scope, changes) VALUES (?, ?, ?)', (run, scope, changes)
+        )
+
+    def delivered(self, run):
+        #Returns {scope: number of changes} for every diff committed in the given run
+        return dict(self._db.execute('SELECT scope, changes FROM deliveries WHERE run = ?', (run,)).fetchall())
+
+    def commit(self):
+        self._db.commit()
+
+    def rollback(self):
+        self._db.rollback()
+
+    def __len__(self):
+        return self._db.execute('SELECT COUNT(*) FROM prices').fetchone()[0]
+
+    def close(self):
+        # Closing without commit() discards any diff that was not committed
+        self._db.close()
+
+def write_changes(changes, path, append=True):
+    #Writes changes as JSON lines and returns how many were written
+    count = 0
+    with open(path, 'a' if append else 'w', encoding='utf-8') as f:
+        for change in changes:
+            f.write(json.dumps(change._asdict(), ensure_ascii=False) + '\n')
+            count += 1
+    return count
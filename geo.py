@@ -0,0 +1,180 @@
+import math
+import threading
+from collections import namedtuple
+
+from api_client import DEFAULT_CONCURRENCY, RESULT_CAP, BookingClient, HostRateLimiter, fetch_many, get_payload_builder
+from listings import API_URL, CHECK_IN, CHECK_OUT, extract_listing_data, get_total_results
+
+METERS_PER_DEGREE = 111320
+DEFAULT_MAX_DEPTH = 3
+
+Tile = namedtuple('Tile', ['south', 'west', 'north', 'east'])
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * 6371000 * math.asin(math.sqrt(a))
+
+def tile_center(tile):
+    return (tile.south + tile.north) / 2, (tile.west + tile.east) / 2
+
+def tile_radius(tile):
+    # Radius of the search circle that covers the whole tile, in whole metres
+    lat, lng = tile_center(tile)
+    return math.ceil(max(haversine_m(lat, lng, corner_lat, corner_lng) for corner_lat, corner_lng in tile_corners(tile)))
+
+def tile_corners(tile):
+    return [(tile.south, tile.west), (tile.south, tile.east), (tile.north, tile.west), (tile.north, tile.east)]
+
+def subdivide(tile):
+    #Splits a tile into four quarters
+    lat, lng = tile_center(tile)
+    return [
+        Tile(tile.south, tile.west, lat, lng),
+        Tile(tile.south, lng, lat, tile.east),
+        Tile(lat, tile.west, tile.north, lng),
+        Tile(lat, lng, tile.north, tile.east),
+    ]
+
+def point_in_polygon(lat, lng, polygon):
+    # Ray casting over a list of (lat, lng) vertices
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        lat_i, lng_i = polygon[i]
+        lat_j, lng_j = polygon[j]
+        if (lat_i > lat) != (lat_j > lat) and lng < (lng_j - lng_i) * (lat - lat_i) / (lat_j - lat_i) + lng_i:
+            inside = not inside
+        j = i
+    return inside
+
+def orientation(a, b, c):
+    # Sign of the cross product: which side of the line a-b the point c lies on
+    cross = (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+    return (cross > 0) - (cross < 0)
+
+def segments_intersect(p1, p2, q1, q2):
+    o1, o2 = orientation(p1, p2, q1), orientation(p1, p2, q2)
+    o3, o4 = orientation(q1, q2, p1), orientation(q1, q2, p2)
+    if o1 != o2 and o3 != o4:
+        return True
+    # Collinear cases: an endpoint lying on the other segment
+    def on_segment(a, b, c):
+        return min(a[0], b[0]) <= c[0] <= max(a[0], b[0]) and min(a[1], b[1]) <= c[1] <= max(a[1], b[1])
+    return ((o1 == 0 and on_segment(p1, p2, q1)) or (o2 == 0 and on_segment(p1, p2, q2))
+            or (o3 == 0 and on_segment(q1, q2, p1)) or (o4 == 0 and on_segment(q1, q2, p2)))
+
+def tile_touches_polygon(tile, polygon):
+    # The tile overlaps the polygon if a tile corner or centre is inside it, a polygon vertex is inside
+    # the tile, or an edge of each crosses (a thin strip can pass through a tile with neither)
+    points = tile_corners(tile) + [tile_center(tile)]
+    if any(point_in_polygon(lat, lng, polygon) for lat, lng in points):
+        return True
+    if any(tile.south <= lat <= tile.north and tile.west <= lng <= tile.east for lat, lng in polygon):
+        return True
+    south_west, south_east, north_west, north_east = tile_corners(tile)
+    tile_edges = [(south_west, south_east), (south_east, north_east), (north_east, north_west), (north_west, south_west)]
+    return any(
+        segments_intersect(polygon[i - 1], polygon[i], start, end)
+        for i in range(len(polygon))
+        for start, end in tile_edges
+    )
+
+def tile_area(south, west, north, east, radius_m=3000, polygon=None):
+    #Covers a bounding box with square tiles whose covering circle has the given radius.
+    #With a polygon only the tiles that touch it are kept
+    side_m = radius_m * math.sqrt(2)
+    lat_step = side_m / METERS_PER_DEGREE
+    rows = max(1, math.ceil((north - south) / lat_step))
+    tiles = []
+    for row in range(rows):
+        tile_south = south + row * lat_step
+        tile_north = min(north, tile_south + lat_step)
+        # Longitude degrees shrink away from the equator, use the row edge furthest from it
+        widest_lat = max(abs(tile_south), abs(tile_north))
+        lng_step = side_m / (METERS_PER_DEGREE * max(math.cos(math.radians(widest_lat)), 1e-6))
+        cols = max(1, math.ceil((east - west) / lng_step))
+        for col in range(cols):
+            tile_west = west + col * lng_step
+            tile = Tile(tile_south, tile_west, tile_north, min(east, tile_west + lng_step))
+            if polygon is None or tile_touches_polygon(tile, polygon):
+                tiles.append(tile)
+    return tiles
+
+def polygon_bounds(polygon):
+    lats = [lat for lat, _ in polygon]
+    lngs = [lng for _, lng in polygon]
+    return min(lats), min(lngs), max(lats), max(lngs)
+
+class SeenIndex:
+    #Incremental set of listing ids already emitted, so overlapping tiles do not repeat rows
+    def __init__(self, ids=()):
+        self._ids = set(ids)
+        self._lock = threading.Lock()
+
+    def add(self, listing_id):
+        # True the first time an id is seen
+        with self._lock:
+            if listing_id in self._ids:
+                return False
+            self._ids.add(listing_id)
+            return True
+
+    def __contains__(self, listing_id):
+        return listing_id in self._ids
+
+    def __len__(self):
+        return len(self._ids)
+
+def sweep_area(bbox=None, polygon=None, page_size=100, radius_m=3000, max_depth=DEFAULT_MAX_DEPTH, result_cap=RESULT_CAP,
+               concurrency=DEFAULT_CONCURRENCY, rate_limit=None, client=None, cache=None, trimmed=False,
+               checkIn=CHECK_IN, checkOut=CHECK_OUT, seen=None, url=API_URL):
+    #Yields each Listing in a (south, west, north, east) box or a polygon of (lat, lng) points once.
+    #Tiles are searched concurrently; a tile whose result count reaches result_cap is split
+    #into quarters (up to max_depth times) because the search would stop paging before the end
+    if polygon is not None:
+        bbox = polygon_bounds(polygon)
+    if bbox is None:
+        raise ValueError('Please provide a bounding box or a polygon')
+    if not isinstance(page_size, int) or page_size <= 0:
+        raise ValueError('Page size must be a positive integer')
+
+    seen = SeenIndex() if seen is None else seen
+    if not isinstance(rate_limit, HostRateLimiter):
+        rate_limit = HostRateLimiter(rate_limit)
+    builder = get_payload_builder(trimmed)
+
+    def payload(tile, offset=0):
+        lat, lng = tile_center(tile)
+        return builder.build(f'{lat:.6f},{lng:.6f}', page_size, checkIn, checkOut, lat, lng, offset, tile_radius(tile))
+
+    def unique(page):
+        for row in extract_listing_data(page):
+            # Rows without an id cannot be matched up, so they are always passed through
+            if row.id == 'N/A' or seen.add(row.id):
+                yield row
+
+    owns_client = client is None
+    if owns_client:
+        client = BookingClient(pool_size=concurrency)
+    try:
+        level = tile_area(*bbox, radius_m=radius_m, polygon=polygon)
+        depth = 0
+        while level:
+            first_pages = fetch_many(url, None, [payload(tile) for tile in level], concurrency, rate_limit, client=client, cache=cache)
+            dense, remaining = [], []
+            for tile, page in zip(level, first_pages):
+                total = get_total_results(page)
+                yield from unique(page)
+                if total >= result_cap and depth < max_depth:
+                    dense.extend(sub for sub in subdivide(tile) if polygon is None or tile_touches_polygon(sub, polygon))
+                else:
+                    remaining.extend(payload(tile, offset) for offset in range(page_size, min(total, result_cap), page_size))
+
+            for page in fetch_many(url, None, remaining, concurrency, rate_limit, client=client, cache=cache):
+                yield from unique(page)
+            level = dense
+            depth += 1
+    finally:
+        if owns_client:
+            client.close()
@@ -1,62 +1,194 @@
-import csv
-from api_client import build_headers, build_search_body, fetch_from_api
+import json
+from collections import namedtuple
+import timing
+from sinks import CsvSink
+from api_client import DEFAULT_CONCURRENCY, RESULT_CAP, BookingClient, HostRateLimiter, build_headers, build_search_body, check_results_page, fetch_from_api, fetch_many, get_payload_builder, stream_from_api
+
+try:
+    import ijson
+except ImportError:  # optional, streaming falls back to json.load
+    ijson = None
 
 API_URL = 'https://www.booking.com/dml/graphql'
+CHECK_IN = '2025-03-29'
+CHECK_OUT = '2025-03-30'
 
-def get_properties(address, page_size, lat=None, lng=None):
-    #Main function to fetch property listings
+def validate_search_inputs(address, lat=None, lng=None):
     if not isinstance(address, str):
         raise ValueError('Please provide a valid text location')
-    if (lat or lng) and not (isinstance(lat, float) and isinstance(lng, float)):
+    if (lat is not None or lng is not None) and not (isinstance(lat, float) and isinstance(lng, float)):
         raise ValueError('Coordinates must be float values')
+
+def get_properties(address, page_size, lat=None, lng=None):
+    #Main function to fetch property listings
+    validate_search_inputs(address, lat, lng)
     
     headers = build_headers()
-    checkIn = '2025-03-29'
-    checkOut = '2025-03-30'
-    payload = build_search_body(address, page_size, checkIn, checkOut,lat, lng)
+    checkIn = CHECK_IN
+    checkOut = CHECK_OUT
+    with timing.stage('build'):
+        payload = build_search_body(address, page_size, checkIn, checkOut,lat, lng)
     
     data = fetch_from_api(API_URL, headers, payload)
     return extract_listing_data(data)
 
+def get_all_properties(address, page_size, lat=None, lng=None, concurrency=DEFAULT_CONCURRENCY, rate_limit=None, client=None, trimmed=False,
+                       checkIn=CHECK_IN, checkOut=CHECK_OUT, cache=None, url=API_URL, result_cap=RESULT_CAP, stream=False):
+    #Fetches every page for a location: the first page gives the total count,
+    #the remaining offsets (up to result_cap, past which booking returns nothing) are then
+    #fetched in parallel and returned in offset order.
+    #trimmed=True sends a query that only asks for the fields extract_listing_data reads,
+    #cache (see cache.py) serves pages already fetched within their TTL.
+    #stream=True parses the pages after the first with iter_listing_rows as they download
+    #instead of decoding whole responses; those pages bypass the cache
+    validate_search_inputs(address, lat, lng)
+    if not isinstance(page_size, int) or page_size <= 0:
+        raise ValueError('Page size must be a positive integer')
+
+    builder = get_payload_builder(trimmed)
+    # One limiter for the whole search so the first page counts against the rate too
+    if not isinstance(rate_limit, HostRateLimiter):
+        rate_limit = HostRateLimiter(rate_limit)
+    owns_client = client is None
+    if owns_client:
+        client = BookingClient(pool_size=concurrency)
+    try:
+        rate_limit.wait(url)
+        first_page = fetch_from_api(url, None, builder.build(address, page_size, checkIn, checkOut, lat, lng), client=client, cache=cache)
+        total = get_total_results(first_page)
+
+        payloads = [
+            builder.build(address, page_size, checkIn, checkOut, lat, lng, offset=offset)
+            for offset in range(page_size, min(total, result_cap), page_size)
+        ]
+        listings = extract_listing_data(first_page)
+        if stream:
+            for rows in fetch_many(url, None, payloads, concurrency, rate_limit, client=client, parse=iter_listing_rows):
+                listings.extend(rows)
+        else:
+            for page in fetch_many(url, None, payloads, concurrency, rate_limit, client=client, cache=cache):
+                listings.extend(extract_listing_data(page))
+        return listings
+    finally:
+        if owns_client:
+            client.close()
+
+def get_total_results(api_response):
+    #Reads the total number of matches reported alongside a results page
+    search = ((api_response.get('data') or {}).get('searchQueries') or {}).get('search') or {}
+    pagination = search.get('pagination', {}) or {}
+    return pagination.get('nbResultsTotal') or 0
+
+# amount is the display string; amount_value and currency come from the API's unformatted fields
+Listing = namedtuple('Listing', ['id', 'title', 'page_name', 'amount', 'amount_value', 'currency'], defaults=(None, None))
+
+RESULTS_PATH = 'data.searchQueries.search.results'
+RESULT_PREFIX = RESULTS_PATH + '.item'
+ERRORS_ITEM = 'errors.item'
+ERROR_MESSAGE_PREFIX = ERRORS_ITEM + '.message'
+RESULT_FIELDS = {
+    RESULT_PREFIX + '.basicPropertyData.id': 'id',
+    RESULT_PREFIX + '.displayName.text': 'title',
+    RESULT_PREFIX + '.basicPropertyData.pageName': 'page_name',
+    RESULT_PREFIX + '.priceDisplayInfoIrene.displayPrice.amountPerStay.amount': 'amount',
+    RESULT_PREFIX + '.priceDisplayInfoIrene.displayPrice.amountPerStay.amountUnformatted': 'amount_value',
+    RESULT_PREFIX + '.priceDisplayInfoIrene.displayPrice.amountPerStay.currency': 'currency',
+}
+SCALAR_EVENTS = {'null', 'boolean', 'integer', 'double', 'number', 'string'}
+EMPTY_LISTING = dict(zip(Listing._fields, ('N/A', 'N/A', 'N/A', 'N/A', None, None)))
+
+def amount_value(value):
+    # amountUnformatted is normally a number, but is occasionally sent as a numeric string
+    if isinstance(value, bool) or value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
 def extract_listing_data(api_response):
     #Extracts and formats listing data from API response
+    with timing.stage('extract'):
+        return _extract_listing_data(api_response)
+
+def _extract_listing_data(api_response):
     results = api_response.get('data', {}).get('searchQueries', {}).get('search', {}).get('results', [])
+    return [listing_from_result(result) for result in results]
 
-    listings = []
-    for result in results:
-        # Get basic property info with default empty dict
-        prop_data = result.get('basicPropertyData', {}) or {}
-        
-        # Get pricing information with default empty dicts
-        price_info = result.get('priceDisplayInfoIrene', {}) or {}
-        display_price = price_info.get('displayPrice', {}) or {}
-        amount_per_stay = display_price.get('amountPerStay', {}) or {}
-        display_name = result.get('displayName', {}) or {}
-        
-        listings.append([
-            prop_data.get('id', 'N/A'),  # Default to 'N/A' if ID is missing
-            display_name.get('text', 'N/A'),  
-            prop_data.get('pageName', 'N/A'), 
-            amount_per_stay.get('amount', 'N/A'),  
-        ])
+def listing_from_result(result):
+    # Get basic property info with default empty dict
+    prop_data = result.get('basicPropertyData', {}) or {}
     
-    return listings 
+    # Get pricing information with default empty dicts
+    price_info = result.get('priceDisplayInfoIrene', {}) or {}
+    display_price = price_info.get('displayPrice', {}) or {}
+    amount_per_stay = display_price.get('amountPerStay', {}) or {}
+    display_name = result.get('displayName', {}) or {}
+    
+    return Listing(
+        prop_data.get('id', 'N/A'),  # Default to 'N/A' if ID is missing
+        display_name.get('text', 'N/A'),  
+        prop_data.get('pageName', 'N/A'), 
+        amount_per_stay.get('amount', 'N/A'),  
+        amount_value(amount_per_stay.get('amountUnformatted')),
+        amount_per_stay.get('currency'),
+    )
+
+def iter_listing_rows(stream):
+    #Yields Listing records from a raw JSON byte stream without building the whole response.
+    #Only the fields in RESULT_FIELDS are kept; every other value is dropped as soon as it is
+    #tokenized, so memory stays flat however large the page. Tokenizing still costs more CPU
+    #than the C json.loads, so this trades CPU time for memory.
+    #Raises ValueError once the body is read if it turns out not to be a results page
+    if ijson is None:
+        data = json.load(stream)
+        check_results_page(data)
+        yield from extract_listing_data(data)
+        return
+
+    fields = None
+    has_results = False
+    errors = []
+    field_name = RESULT_FIELDS.get
+    for prefix, event, value in ijson.parse(stream, use_float=True):
+        # Most events belong to fields we skip, so the dict lookup comes first
+        name = field_name(prefix)
+        if name is not None:
+            if fields is not None and event in SCALAR_EVENTS:
+                fields[name] = value
+        elif prefix == RESULT_PREFIX:
+            if event == 'start_map':
+                fields = dict(EMPTY_LISTING)
+            elif event == 'end_map':
+                fields['amount_value'] = amount_value(fields['amount_value'])
+                yield Listing(**fields)
+                fields = None
+        elif prefix == RESULTS_PATH:
+            has_results = has_results or event == 'start_array'
+        elif prefix == ERRORS_ITEM:
+            if event != 'end_map':
+                errors.append(value)
+        elif prefix == ERROR_MESSAGE_PREFIX and errors:
+            errors[-1] = value
+    # Same checks as check_results_page, made after the fact since errors can follow the data
+    if errors:
+        raise ValueError(f'Not a search results page: the response has GraphQL errors ({errors[0]})')
+    if not has_results:
+        raise ValueError('Not a search results page: the response has no results list')
+
+def stream_listings(payload, client=None, headers=None, url=API_URL):
+    #Fetches one results page and yields Listing records while the body is still arriving
+    response = stream_from_api(url, headers, payload, client=client)
+    with response:
+        response.raw.decode_content = True
+        yield from iter_listing_rows(response.raw)
 
 def save_to_csv(listings, filename='listings.csv'):
 
     #Saves listings data to CSV with specified headers
-    headers = [
-        'Listing ID', 
-        'Listing Title', 
-        'Page Name', 
-        'Amount Per Stay'
-    ]
-    
     try:
-        with open(filename, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(headers)
-            writer.writerows(listings)
+        with CsvSink(filename, append=False) as sink:
+            sink.write_rows(listings)
         print(f'Successfully saved {len(listings)} properties to {filename}')
     except IOError as e:
         print(f'Error saving file: {e}')
@@ -0,0 +1,148 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def make_result(index, padding=0):
+    #One search result shaped like the FullSearch response, with `padding` extra blocks
+    #standing in for the fields extract_listing_data never reads
+    listing_id = 1000000 + index
+    amount = 100 + (index * 37) % 900
+    return {
+        'basicPropertyData': {
+            'id': listing_id,
+            'pageName': f'mock-hotel-{listing_id}',
+            'location': {'address': f'{index} Mock Street', 'city': 'Mockville', 'countryCode': 'ae', '__typename': 'Location'},
+            'photos': {'main': {'highResUrl': {'relativeUrl': f'/images/{listing_id}.jpg'}}},
+            '__typename': 'BasicPropertyData',
+        },
+        'displayName': {'text': f'Mock Hotel {index}', 'translationTag': None, '__typename': 'TranslationTag'},
+        'priceDisplayInfoIrene': {
+            'displayPrice': {
+                'copy': {'translation': 'Price', '__typename': 'TranslationTag'},
+                'amountPerStay': {
+                    'amount': f'AED {amount:,}',
+                    'amountRounded': f'AED {amount:,}',
+                    'amountUnformatted': amount,
+                    'currency': 'AED',
+                    '__typename': 'Price',
+                },
+                '__typename': 'DisplayPrice',
+            },
+            '__typename': 'PriceDisplayInfoIrene',
+        },
+        'blocks': [
+            {'blockId': f'{listing_id}_{n}', 'finalPrice': {'amount': amount + n, 'currency': 'AED'}, 'freeCancellationUntil': None}
+            for n in range(padding)
+        ],
+        '__typename': 'SearchResultProperty',
+    }
+
+def make_response(offset, rows, total, padding=0):
+    #A FullSearch response page for results [offset, offset + rows) out of `total`
+    end = min(offset + rows, total)
+    return {'data': {'searchQueries': {'search': {
+        'banners': [{'title': 'Mock banner', '__typename': 'Banner'}] * 3,
+        'pagination': {'nbResultsPerPage': rows, 'nbResultsTotal': total, '__typename': 'Pagination'},
+        'results': [make_result(i, padding) for i in range(offset, end)],
+        '__typename': 'SearchQueryOutput',
+    }, '__typename': 'SearchQueries'}}}
+
+class MockBookingServer:
+    #Local stand-in for the booking.com GraphQL endpoint, for offline tests and benchmarks.
+    #Serves generated FullSearch pages that honour the request's pagination, after `latency` seconds
+    def __init__(self, total_results=100, latency=0.0, padding=0, host='127.0.0.1', port=0):
+        self.total_results = total_results
+        self.latency = latency
+        self.padding = padding
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._cache = {}
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/dml/graphql'
+
+    def response_bytes(self, offset, rows):
+        # Pages are generated once per (offset, rows) so serving cost stays out of client timings
+        key = (offset, rows)
+        if key not in self._cache:
+            body = make_response(offset, rows, self.total_results, self.padding)
+            self._cache[key] = json.dumps(body, separators=(',', ':')).encode('utf-8')
+        return self._cache[key]
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True  # otherwise small pages wait on delayed ACKs
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('content-length', 0)))
+                with server._lock:
+                    server.requests += 1
+                try:
+                    pagination = json.loads(body)['variables']['input']['pagination']
+                    offset, rows = int(pagination['offset']), int(pagination['rowsPerPage'])
+                except (ValueError, KeyError, TypeError):
+                    self.send_error(400, 'Expected a FullSearch payload')
+                    return
+                if server.latency:
+                    time.sleep(server.latency)
+                payload = server.response_bytes(offset, rows)
+                self.send_response(200)
+                self.send_header('content-type', 'application/json')
+                self.send_header('content-length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        # A short poll interval keeps stop() quick, which matters when tests start many servers
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve generated booking.com search responses locally')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--results', type=int, default=1000, help='total results reported per search')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds to wait before each response')
+    parser.add_argument('--padding', type=int, default=5, help='unused blocks per result, to bulk up responses')
+    args = parser.parse_args(argv)
+
+    server = MockBookingServer(args.results, args.latency, args.padding, port=args.port)
+    print(f'Serving mock search results on {server.url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
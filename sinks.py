@@ -0,0 +1,163 @@
+import csv
+import json
+import os
+import re
+
+import timing
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional, only needed for ParquetSink
+    pa = pq = None
+
+CSV_HEADERS = [
+    'Listing ID',
+    'Listing Title',
+    'Page Name',
+    'Amount Per Stay'
+]
+DEFAULT_BUFFER_ROWS = 1000
+# A whole display price in the en-gb format the searches ask for: optional currency, comma
+# thousands separators, up to two decimals. Anything else is left unparsed rather than guessed
+AMOUNT_PATTERN = re.compile(r'\s*([^\d\s.,]*)\s*(\d{1,3}(?:,\d{3})+|\d+)(\.\d{1,2})?\s*([^\d\s.,]*)\s*')
+
+def parse_amount(amount):
+    #Fallback for rows without the unformatted amount: splits a display price such as 'AED 1,234' or
+    #'US$120.50' into (1234.0, 'AED') / (120.5, 'US$'), and returns (None, None) for any other format
+    if not isinstance(amount, str):
+        return (None, None) if isinstance(amount, bool) or not isinstance(amount, (int, float)) else (float(amount), None)
+    match = AMOUNT_PATTERN.fullmatch(amount)
+    if not match:
+        return None, None
+    prefix, whole, fraction, suffix = match.groups()
+    if prefix and suffix:
+        return None, None
+    return float(whole.replace(',', '') + (fraction or '')), prefix or suffix or None
+
+def typed_record(row):
+    #Turns a Listing row into a dict with a numeric amount and currency column, preferring the
+    #API's unformatted amount and only parsing the display string when that is missing
+    listing_id, title, page_name, amount = row[:4]
+    value, currency = row[4:6] if len(row) >= 6 else (None, None)
+    if value is None:
+        value, parsed_currency = parse_amount(amount)
+        currency = currency or parsed_currency
+    return {
+        'listing_id': listing_id if isinstance(listing_id, int) else None,
+        'title': title,
+        'page_name': page_name,
+        'amount': amount,
+        'amount_value': value,
+        'currency': currency,
+    }
+
+class Sink:
+    #Base class for streaming writers: rows are buffered and written out every `buffer_rows` rows
+    def __init__(self, path, buffer_rows=DEFAULT_BUFFER_ROWS):
+        self.path = path
+        self.buffer_rows = buffer_rows
+        self.rows_written = 0
+        self._buffer = []
+
+    def write(self, row):
+        self._buffer.append(row)
+        if len(self._buffer) >= self.buffer_rows:
+            self.flush()
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.write(row)
+
+    def flush(self):
+        if self._buffer:
+            with timing.stage('write'):
+                self._write_batch(self._buffer)
+            self.rows_written += len(self._buffer)
+            self._buffer = []
+
+    def _write_batch(self, rows):
+        raise NotImplementedError
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class CsvSink(Sink):
+    #CSV with the display columns only; in append mode the header is only written for a new file
+    def __init__(self, path, append=True, buffer_rows=DEFAULT_BUFFER_ROWS):
+        super().__init__(path, buffer_rows)
+        write_header = not (append and os.path.exists(path) and os.path.getsize(path) > 0)
+        self._file = open(path, 'a' if append else 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        if write_header:
+            self._writer.writerow(CSV_HEADERS)
+
+    def _write_batch(self, rows):
+        width = len(CSV_HEADERS)
+        self._writer.writerows(row[:width] for row in rows)
+        self._file.flush()
+
+    def close(self):
+        super().close()
+        self._file.close()
+
+class JsonlSink(Sink):
+    #One typed JSON object per line, appended to an existing file unless append=False
+    def __init__(self, path, append=True, buffer_rows=DEFAULT_BUFFER_ROWS):
+        super().__init__(path, buffer_rows)
+        self._file = open(path, 'a' if append else 'w', encoding='utf-8')
+
+    def _write_batch(self, rows):
+        self._file.write(''.join(json.dumps(typed_record(row), ensure_ascii=False) + '\n' for row in rows))
+        self._file.flush()
+
+    def close(self):
+        super().close()
+        self._file.close()
+
+class ParquetSink(Sink):
+    #Typed Parquet file written one row group per buffered batch. Parquet files cannot be
+    #appended to, so append=True is refused for an existing file instead of replacing it
+    def __init__(self, path, append=False, buffer_rows=DEFAULT_BUFFER_ROWS * 50):
+        if pa is None:
+            raise ImportError('ParquetSink needs pyarrow: pip install pyarrow')
+        if append and os.path.exists(path):
+            raise ValueError(f'Cannot append to existing Parquet file {path!r}; write a new file or pass append=False')
+        super().__init__(path, buffer_rows)
+        self.schema = pa.schema([
+            ('listing_id', pa.int64()),
+            ('title', pa.string()),
+            ('page_name', pa.string()),
+            ('amount', pa.string()),
+            ('amount_value', pa.float64()),
+            ('currency', pa.string()),
+        ])
+        self._writer = pq.ParquetWriter(path, self.schema)
+
+    def _write_batch(self, rows):
+        records = [typed_record(row) for row in rows]
+        columns = {name: [record[name] for record in records] for name in self.schema.names}
+        self._writer.write_table(pa.table(columns, schema=self.schema))
+
+    def close(self):
+        super().close()
+        self._writer.close()
+
+SINKS = {
+    'csv': CsvSink,
+    'jsonl': JsonlSink,
+    'parquet': ParquetSink,
+}
+
+def open_sink(path, fmt=None, **kwargs):
+    #Picks a sink from the explicit format or the file extension
+    fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+    if fmt not in SINKS:
+        raise ValueError(f'Unsupported output format: {fmt!r} (expected one of {", ".join(SINKS)})')
+    return SINKS[fmt](path, **kwargs)
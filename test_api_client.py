@@ -0,0 +1,165 @@
+import json
+import time
+import unittest
+from unittest.mock import MagicMock, Mock, patch
+
+import requests
+
+import timing
+from api_client import (
+    LISTING_FIELDS_QUERY, BookingClient, HostRateLimiter, SearchPayloadBuilder, build_search_body, fetch_from_api,
+    fetch_many, get_payload_builder,
+)
+
+RESULTS_PAGE = {'data': {'searchQueries': {'search': {'results': []}}}}
+
+def make_response(status, body=None, headers=None):
+    response = Mock(status_code=status, headers=headers or {})
+    response.json.return_value = body
+    if status >= 400:
+        response.raise_for_status.side_effect = requests.HTTPError(str(status))
+    return response
+
+class TestFetchMany(unittest.TestCase):
+
+    @patch('api_client.fetch_from_api')
+    def test_results_keep_payload_order(self, mock_fetch):
+        """Test that responses come back in payload order regardless of finish order"""
+        def slow_echo(url, headers, payload, **kwargs):
+            time.sleep(0.01 * (5 - payload))
+            return payload
+        mock_fetch.side_effect = slow_echo
+
+        self.assertEqual(fetch_many('https://example.com', {}, range(5), concurrency=5), [0, 1, 2, 3, 4])
+
+    @patch('api_client.stream_from_api')
+    def test_parse_reads_raw_stream(self, mock_stream):
+        """Test that with parse each raw body is parsed and the response closed"""
+        response = MagicMock()
+        mock_stream.return_value = response
+
+        self.assertEqual(fetch_many('https://example.com', {}, [b'{}'], parse=lambda raw: [raw, raw]), [[response.raw, response.raw]])
+        response.__exit__.assert_called_once()
+
+    @patch('api_client.stream_from_api')
+    def test_parse_time_recorded_as_stream_stage(self, mock_stream):
+        """Test that downloading and parsing a streamed body is timed, not just the headers"""
+        def slow_parse(raw):
+            time.sleep(0.02)
+            return []
+        timing.reset()
+        timing.enable()
+        self.addCleanup(timing.reset)
+        self.addCleanup(timing.disable)
+
+        fetch_many('https://example.com', {}, [b'{}'], parse=slow_parse)
+
+        stats = timing.snapshot()
+        self.assertEqual(stats['stream']['count'], 1)
+        self.assertGreaterEqual(stats['stream']['max'], 20)
+
+    @patch('api_client.fetch_from_api')
+    def test_empty_payloads(self, mock_fetch):
+        """Test that no payloads means no requests"""
+        self.assertEqual(fetch_many('https://example.com', {}, []), [])
+        mock_fetch.assert_not_called()
+
+    def test_rate_limiter_spaces_requests_per_host(self):
+        """Test that the limiter delays requests to the same host only"""
+        limiter = HostRateLimiter(rate=20)
+        start = time.monotonic()
+        for _ in range(3):
+            limiter.wait('https://a.example.com/x')
+        limiter.wait('https://b.example.com/x')
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+        self.assertLess(time.monotonic() - start, 0.5)
+
+class TestBookingClient(unittest.TestCase):
+
+    def setUp(self):
+        self.client = BookingClient(headers={'accept': '*/*', 'cookie': 'a=1; b=x=y'}, backoff=0)
+        self.addCleanup(self.client.close)
+
+    def test_cookie_header_moves_to_jar(self):
+        """Test that the static cookie header is kept in the session cookie jar"""
+        self.assertNotIn('cookie', self.client.session.headers)
+        self.assertEqual(self.client.session.cookies.get('a'), '1')
+        self.assertEqual(self.client.session.cookies.get('b'), 'x=y')
+
+    @patch('api_client.time.sleep')
+    def test_retries_server_errors(self, mock_sleep):
+        """Test that 429/5xx responses are retried until one succeeds"""
+        with patch.object(self.client.session, 'post') as mock_post:
+            mock_post.side_effect = [make_response(503), make_response(429), make_response(200, RESULTS_PAGE)]
+            self.assertEqual(fetch_from_api('https://example.com', None, {}, client=self.client), RESULTS_PAGE)
+        self.assertEqual(mock_post.call_count, 3)
+        self.assertEqual(self.client.stats()['retries'], 2)
+
+    @patch('api_client.time.sleep')
+    def test_gives_up_after_max_retries(self, mock_sleep):
+        """Test that the last failure is raised once retries run out"""
+        with patch.object(self.client.session, 'post') as mock_post:
+            mock_post.side_effect = requests.ConnectionError('down')
+            with self.assertRaises(requests.ConnectionError):
+                self.client.post('https://example.com', {})
+        self.assertEqual(mock_post.call_count, self.client.max_retries + 1)
+
+    def test_client_errors_are_not_retried(self):
+        """Test that a 4xx other than 429 fails straight away"""
+        with patch.object(self.client.session, 'post') as mock_post:
+            mock_post.return_value = make_response(404)
+            with self.assertRaises(requests.HTTPError):
+                self.client.post('https://example.com', {})
+        mock_post.assert_called_once()
+
+    def test_backoff_grows_and_honours_retry_after(self):
+        """Test exponential backoff with jitter and Retry-After"""
+        client = BookingClient(headers={}, backoff=1)
+        self.assertTrue(1 <= client.backoff_delay(0) <= 2)
+        self.assertTrue(4 <= client.backoff_delay(2) <= 8)
+        self.assertGreaterEqual(client.backoff_delay(0, '30'), 30)
+
+class TestBuildSearchBody(unittest.TestCase):
+
+    def test_offset(self):
+        """Test that the pagination offset is passed through"""
+        body = build_search_body('Dubai', 25, '2025-03-29', '2025-03-30', offset=50)
+        self.assertEqual(body['variables']['input']['pagination'], {'rowsPerPage': 25, 'offset': 50})
+
+    def test_zero_coordinates(self):
+        """Test that 0.0 coordinates are sent as a lat/long search rather than dropped"""
+        location = build_search_body('Null Island', 25, '2025-03-29', '2025-03-30', 0.0, 0.0)['variables']['input']['location']
+        self.assertEqual(location, {'searchString': 'Null Island', 'destType': 'LATLONG', 'latitude': 0.0, 'longitude': 0.0})
+        self.assertEqual(json.loads(get_payload_builder().build('Null Island', 25, '2025-03-29', '2025-03-30', 0.0, 0.0))['variables']['input']['location'], location)
+
+class TestSearchPayloadBuilder(unittest.TestCase):
+
+    def test_matches_build_search_body(self):
+        """Test that the spliced bytes decode to the same payload as build_search_body"""
+        builder = SearchPayloadBuilder()
+        for args in [('Dubai', 25, '2025-03-29', '2025-03-30'), ('Bangalore', 10, '2025-04-01', '2025-04-03', 12.9716, 77.5946)]:
+            self.assertEqual(json.loads(builder.build(*args, offset=30)), build_search_body(*args, offset=30))
+
+    def test_escapes_variable_fields(self):
+        """Test that quotes and non-ascii text in the address stay valid JSON"""
+        body = json.loads(SearchPayloadBuilder().build('Qu"ébec', 5, 'a', 'b'))
+        self.assertEqual(body['variables']['input']['location'], {'searchString': 'Qu"ébec'})
+
+    def test_trimmed_query(self):
+        """Test that the trimmed builder is cached and much smaller"""
+        builder = get_payload_builder(trimmed=True)
+        self.assertIs(builder, get_payload_builder(trimmed=True))
+        body = builder.build('Dubai', 25, 'a', 'b')
+        self.assertEqual(json.loads(body)['query'], LISTING_FIELDS_QUERY)
+        self.assertLess(len(body) * 5, len(get_payload_builder().build('Dubai', 25, 'a', 'b')))
+
+    @patch('api_client.requests.post')
+    def test_bytes_payload_sent_as_data(self, mock_post):
+        """Test that pre-serialized payloads are not JSON-encoded a second time"""
+        mock_post.return_value = make_response(200, RESULTS_PAGE)
+        fetch_from_api('https://example.com', {}, b'{}')
+        self.assertEqual(mock_post.call_args[1]['data'], b'{}')
+        self.assertNotIn('json', mock_post.call_args[1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+
+import batch_crawl
+
+from batch_crawl import CHECKPOINT_NAME, Job, job_id, load_checkpoint, load_manifest, run_batch
+from listings import Listing
+
+MANIFEST = """address,lat,lng,checkin,checkout
+Dubai,,,2025-03-29,2025-03-30
+Bangalore,12.9716,77.5946,2025-04-01,2025-04-02
+"""
+
+class TestBatchCrawl(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.manifest = os.path.join(self.tmp.name, 'jobs.csv')
+        with open(self.manifest, 'w') as f:
+            f.write(MANIFEST)
+        self.out_dir = os.path.join(self.tmp.name, 'out')
+
+    def test_load_manifest(self):
+        """Test that blank coordinates become None and the rest become floats"""
+        self.assertEqual(load_manifest(self.manifest), [
+            Job('Dubai', None, None, '2025-03-29', '2025-03-30'),
+            Job('Bangalore', 12.9716, 77.5946, '2025-04-01', '2025-04-02'),
+        ])
+
+    @patch('batch_crawl.get_all_properties')
+    def test_writes_results_and_checkpoint(self, mock_get_all):
+        """Test that each job gets its own output file and a checkpoint line"""
+        mock_get_all.return_value = [Listing(1, 'Hotel', 'hotel', 'AED 100')]
+
+        summary = run_batch(self.manifest, self.out_dir, workers=0, page_size=50)
+
+        self.assertEqual(summary, {'skipped': 0, 'completed': 2, 'failed': 0})
+        self.assertEqual(mock_get_all.call_args[1]['checkIn'], '2025-04-01')
+        for job in load_manifest(self.manifest):
+            with open(os.path.join(self.out_dir, f'{job_id(job)}.csv'), newline='') as f:
+                self.assertEqual(list(csv.reader(f))[1], ['1', 'Hotel', 'hotel', 'AED 100'])
+        self.assertEqual(len(load_checkpoint(os.path.join(self.out_dir, CHECKPOINT_NAME))), 2)
+
+    @patch('batch_crawl.get_all_properties')
+    def test_restart_skips_finished_jobs(self, mock_get_all):
+        """Test that only jobs that failed earlier are run again"""
+        mock_get_all.side_effect = [[], ValueError('boom')]
+        self.assertEqual(run_batch(self.manifest, self.out_dir, workers=0)['failed'], 1)
+
+        mock_get_all.side_effect = None
+        mock_get_all.return_value = []
+        summary = run_batch(self.manifest, self.out_dir, workers=0)
+
+        self.assertEqual(summary, {'skipped': 1, 'completed': 1, 'failed': 0})
+        self.assertEqual(mock_get_all.call_args[0][0], 'Bangalore')
+
+    @patch('batch_crawl.get_all_properties')
+    def test_changes_mode_writes_deltas(self, mock_get_all):
+        """Test that with a price index only new and repriced listings are written"""
+        changes_db = os.path.join(self.tmp.name, 'prices.db')
+        mock_get_all.return_value = [Listing(1, 'Hotel', 'hotel', 'AED 100')]
+        run_batch(self.manifest, os.path.join(self.tmp.name, 'first'), workers=0, changes_path=changes_db)
+
+        mock_get_all.return_value = [Listing(1, 'Hotel', 'hotel', 'AED 120')]
+        run_batch(self.manifest, self.out_dir, workers=0, changes_path=changes_db)
+
+        job = load_manifest(self.manifest)[0]
+        with open(os.path.join(self.out_dir, f'{job_id(job)}.changes.jsonl'), encoding='utf-8') as f:
+            changes = [json.loads(line) for line in f]
+        self.assertEqual([(c['kind'], c['amount'], c['previous_amount']) for c in changes], [('repriced', 'AED 120', 'AED 100')])
+
+    @patch('batch_crawl.get_all_properties')
+    def test_changes_survive_failed_write(self, mock_get_all):
+        """Test that a job whose changes file could not be written is diffed again on rerun"""
+        changes_db = os.path.join(self.tmp.name, 'prices.db')
+        mock_get_all.return_value = [Listing(1, 'Hotel', 'hotel', 'AED 100')]
+        with patch('batch_crawl.os.replace', side_effect=OSError('disk full')):
+            summary = run_batch(self.manifest, self.out_dir, workers=0, changes_path=changes_db)
+        self.assertEqual(summary['completed'], 0)
+
+        run_batch(self.manifest, self.out_dir, workers=0, changes_path=changes_db)
+
+        job = load_manifest(self.manifest)[0]
+        with open(os.path.join(self.out_dir, f'{job_id(job)}.changes.jsonl'), encoding='utf-8') as f:
+            self.assertEqual([json.loads(line)['kind'] for line in f], ['new'])
+
+    @patch('batch_crawl.get_all_properties')
+    def test_rerun_keeps_delivered_changes(self, mock_get_all):
+        """Test that a crash between committing the index and writing the checkpoint loses no changes"""
+        changes_db = os.path.join(self.tmp.name, 'prices.db')
+        mock_get_all.return_value = [Listing(1, 'Hotel', 'hotel', 'AED 100')]
+        run_batch(self.manifest, os.path.join(self.tmp.name, 'first'), workers=0, changes_path=changes_db)
+
+        mock_get_all.return_value = [Listing(1, 'Hotel', 'hotel', 'AED 120')]
+        with patch('batch_crawl.timing.merge', side_effect=KeyboardInterrupt), self.assertRaises(KeyboardInterrupt):
+            run_batch(self.manifest, self.out_dir, workers=0, changes_path=changes_db)
+        mock_get_all.reset_mock()
+
+        summary = run_batch(self.manifest, self.out_dir, workers=0, changes_path=changes_db)
+
+        self.assertEqual((summary['skipped'], summary['completed']), (1, 1))
+        self.assertEqual(mock_get_all.call_count, 1)
+        self.assertEqual(len(load_checkpoint(os.path.join(self.out_dir, CHECKPOINT_NAME))), 2)
+        for job in load_manifest(self.manifest):
+            with open(os.path.join(self.out_dir, f'{job_id(job)}.changes.jsonl'), encoding='utf-8') as f:
+                self.assertEqual([(c['kind'], c['amount']) for c in map(json.loads, f)], [('repriced', 'AED 120')])
+
+    @patch('batch_crawl.ProcessPoolExecutor')
+    def test_rate_limit_split_across_workers(self, mock_pool):
+        """Test that the total rate limit is divided between worker processes"""
+        pool = mock_pool.return_value.__enter__.return_value
+        pool.submit.side_effect = lambda *args: Mock(result=Mock(side_effect=ValueError('not run')))
+        with patch('batch_crawl.as_completed', side_effect=lambda futures: list(futures)):
+            run_batch(self.manifest, self.out_dir, workers=4, rate_limit=8)
+        self.assertEqual(pool.submit.call_args[0][5], 2)
+
+    @patch('batch_crawl.get_all_properties')
+    def test_inline_run_closes_resources_on_interrupt(self, mock_get_all):
+        """Test that an interrupt still closes the client and resets the globals"""
+        mock_get_all.side_effect = KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            run_batch(self.manifest, self.out_dir, workers=0)
+        self.assertIsNone(batch_crawl._worker_client)
+
+    def test_checkpoint_ignores_truncated_line(self):
+        """Test that a partially written checkpoint line does not break a restart"""
+        os.makedirs(self.out_dir)
+        path = os.path.join(self.out_dir, CHECKPOINT_NAME)
+        with open(path, 'w') as f:
+            f.write(json.dumps({'job': 'abc'}) + '\n{"job": "de')
+        self.assertEqual(load_checkpoint(path), {'abc'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from api_client import build_search_body, fetch_from_api, get_payload_builder
+from cache import MemoryCache, SqliteCache, cache_key
+
+class TestCacheKey(unittest.TestCase):
+
+    def test_same_search_same_key(self):
+        """Test that dict and pre-serialized payloads for one search share a key"""
+        args = ('Dubai', 25, '2025-03-29', '2025-03-30', 25.2, 55.3)
+        self.assertEqual(cache_key(build_search_body(*args)), cache_key(get_payload_builder().build(*args)))
+
+    def test_variable_fields_change_key(self):
+        """Test that offset, dates and query text all feed into the key"""
+        base = cache_key(build_search_body('Dubai', 25, '2025-03-29', '2025-03-30'))
+        self.assertNotEqual(base, cache_key(build_search_body('Dubai', 25, '2025-03-29', '2025-03-30', offset=25)))
+        self.assertNotEqual(base, cache_key(build_search_body('Dubai', 25, '2025-03-29', '2025-03-31')))
+        self.assertNotEqual(base, cache_key(get_payload_builder(trimmed=True).build('Dubai', 25, '2025-03-29', '2025-03-30')))
+
+    @patch('cache.json.loads')
+    def test_builder_payload_not_decoded(self, mock_loads):
+        """Test that keys for builder payloads come from their variables, not the body"""
+        cache_key(get_payload_builder().build('Dubai', 25, '2025-03-29', '2025-03-30'))
+        mock_loads.assert_not_called()
+
+    def test_plain_bytes_hash_body(self):
+        """Test that other byte payloads are keyed on their exact content"""
+        self.assertEqual(cache_key(b'{"a":1}'), cache_key(bytearray(b'{"a":1}')))
+        self.assertNotEqual(cache_key(b'{"a":1}'), cache_key(b'{"a":2}'))
+
+class CacheBehaviour:
+    # Shared checks run against both backends
+
+    def test_hit_and_miss(self):
+        """Test that stored values are returned and counted"""
+        self.assertIsNone(self.cache.get('a'))
+        self.cache.set('a', {'data': 1})
+        self.assertEqual(self.cache.get('a'), {'data': 1})
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    @patch('cache.time.time')
+    def test_ttl_expiry(self, mock_time):
+        """Test that entries stop being served once their TTL passes"""
+        mock_time.return_value = 1000
+        self.cache.set('a', {'data': 1}, ttl=10)
+        mock_time.return_value = 1011
+        self.assertIsNone(self.cache.get('a'))
+
+    @patch('cache.time.time')
+    def test_least_recently_used_evicted(self, mock_time):
+        """Test that the entry untouched the longest goes first"""
+        for i, key in enumerate(['a', 'b', 'c']):
+            mock_time.return_value = 1000 + i
+            self.cache.set(key, {'key': key})
+        mock_time.return_value = 1005
+        self.cache.get('a')
+        mock_time.return_value = 1006
+        self.cache.set('d', {'key': 'd'})
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('a'), {'key': 'a'})
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+class TestMemoryCache(CacheBehaviour, unittest.TestCase):
+
+    def setUp(self):
+        self.cache = MemoryCache(max_entries=3)
+
+class TestSqliteCache(CacheBehaviour, unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache = SqliteCache(os.path.join(tmp.name, 'cache.db'), max_entries=3)
+        self.addCleanup(self.cache.close)
+
+RESULTS_PAGE = {'data': {'searchQueries': {'search': {'results': [], 'pagination': {'nbResultsTotal': 0}}}}}
+
+class TestFetchWithCache(unittest.TestCase):
+
+    @patch('api_client.stream_from_api')
+    def test_second_fetch_served_from_cache(self, mock_stream):
+        """Test that a repeated search does not hit the network"""
+        mock_stream.return_value.json.return_value = RESULTS_PAGE
+        cache = MemoryCache()
+        payload = build_search_body('Dubai', 25, '2025-03-29', '2025-03-30')
+
+        for _ in range(2):
+            self.assertEqual(fetch_from_api('https://example.com', {}, payload, cache=cache), RESULTS_PAGE)
+
+        mock_stream.assert_called_once()
+        self.assertEqual(cache.stats()['hits'], 1)
+
+    @patch('api_client.stream_from_api')
+    def test_error_bodies_not_cached(self, mock_stream):
+        """Test that error and result-less responses raise and are fetched again next time"""
+        cache = MemoryCache()
+        payload = build_search_body('Dubai', 25, '2025-03-29', '2025-03-30')
+        bodies = [{'errors': [{'message': 'rate limited'}], 'data': None}, {'data': {}}, {'errors': [{'message': 'partial'}], **RESULTS_PAGE}]
+
+        for body in bodies:
+            mock_stream.return_value.json.return_value = body
+            with self.assertRaises(ValueError):
+                fetch_from_api('https://example.com', {}, payload, cache=cache)
+
+        self.assertEqual(mock_stream.call_count, 3)
+        self.assertEqual(cache.stats()['entries'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
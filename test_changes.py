@@ -0,0 +1,102 @@
+import json
+import os
+import tempfile
+import unittest
+
+from changes import NEW, REMOVED, REPRICED, Change, PriceIndex, write_changes
+from listings import Listing
+
+class TestPriceIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, 'prices.db')
+        self.index = PriceIndex(self.path)
+        self.addCleanup(lambda: self.index.close())
+
+    def reopen(self):
+        self.index.close()
+        self.index = PriceIndex(self.path)
+
+    def crawl(self, rows, scope='default'):
+        changes = list(self.index.diff(rows, scope=scope))
+        self.index.commit()
+        return changes
+
+    def test_first_crawl_is_all_new(self):
+        """Test that every listing is new against an empty index"""
+        rows = [Listing(1, 'A', 'a', 'AED 100'), Listing(2, 'B', 'b', 'AED 200')]
+        self.assertEqual([c.kind for c in self.index.diff(rows)], [NEW, NEW])
+        self.assertEqual(len(self.index), 2)
+
+    def test_only_deltas_on_next_crawl(self):
+        """Test that unchanged listings are dropped and repriced/removed ones reported"""
+        self.crawl([Listing(1, 'A', 'a', 'AED 100'), Listing(2, 'B', 'b', 'AED 200'), Listing(3, 'C', 'c', 'AED 300')])
+        self.reopen()
+
+        changes = self.crawl([Listing(1, 'A', 'a', 'AED 100'), Listing(2, 'B', 'b', 'AED 250'), Listing(4, 'D', 'd', 'AED 50')])
+
+        self.assertEqual(changes, [
+            Change(REPRICED, 2, 'B', 'b', 'AED 250', 'AED 200'),
+            Change(NEW, 4, 'D', 'd', 'AED 50', None),
+            Change(REMOVED, 3, 'C', 'c', None, 'AED 300'),
+        ])
+        self.assertEqual(self.crawl([Listing(1, 'A', 'a', 'AED 100'), Listing(2, 'B', 'b', 'AED 250'), Listing(4, 'D', 'd', 'AED 50')]), [])
+
+    def test_scopes_are_independent(self):
+        """Test that a crawl of one scope never removes listings from another"""
+        self.crawl([Listing(1, 'A', 'a', 'AED 100')], scope='dubai')
+        self.assertEqual([c.kind for c in self.crawl([Listing(2, 'B', 'b', 'GBP 90')], scope='london')], [NEW])
+        self.assertEqual(self.crawl([Listing(1, 'A', 'a', 'AED 100')], scope='dubai'), [])
+
+    def test_partial_crawl_reports_no_removals(self):
+        """Test that stopping early keeps the listings that were not reached, at their old prices"""
+        self.crawl([Listing(1, 'A', 'a', 'AED 100'), Listing(2, 'B', 'b', 'AED 200')])
+        changes = self.index.diff([Listing(1, 'A', 'a', 'AED 110')])
+        next(changes)
+        changes.close()
+        self.reopen()
+        self.assertEqual(len(self.index), 2)
+        self.assertEqual(self.crawl([Listing(1, 'A', 'a', 'AED 100'), Listing(2, 'B', 'b', 'AED 200')]), [])
+
+    def test_uncommitted_diff_is_discarded(self):
+        """Test that a diff that was never committed is reported again on the next crawl"""
+        rows = [Listing(1, 'A', 'a', 'AED 100')]
+        list(self.index.diff(rows))
+        self.reopen()
+        self.assertEqual([c.kind for c in self.crawl(rows)], [NEW])
+
+    def test_error_while_diffing_rolls_back(self):
+        """Test that an exception from the row source undoes the rows already applied"""
+        def failing_rows():
+            yield Listing(1, 'A', 'a', 'AED 100')
+            raise IOError('connection dropped')
+        with self.assertRaises(IOError):
+            list(self.index.diff(failing_rows()))
+        self.assertEqual(len(self.index), 0)
+
+    def test_delivery_committed_with_prices(self):
+        """Test that a delivery record only survives if the diff it belongs to is committed"""
+        list(self.index.diff([Listing(1, 'A', 'a', 'AED 100')], scope='job'))
+        self.index.mark_delivered('run-1', 'job', 1)
+        self.index.rollback()
+        self.assertEqual(self.index.delivered('run-1'), {})
+
+        list(self.index.diff([Listing(1, 'A', 'a', 'AED 100')], scope='job'))
+        self.index.mark_delivered('run-1', 'job', 1)
+        self.index.commit()
+        self.reopen()
+        self.assertEqual(self.index.delivered('run-1'), {'job': 1})
+        self.assertEqual(self.index.delivered('run-2'), {})
+
+    def test_write_changes(self):
+        """Test that changes are written as JSON lines"""
+        path = os.path.join(self.tmp.name, 'changes.jsonl')
+        count = write_changes(self.index.diff([Listing(1, 'A', 'a', 'AED 100')]), path)
+        with open(path, encoding='utf-8') as f:
+            self.assertEqual(json.loads(f.readline())['kind'], NEW)
+        self.assertEqual(count, 1)
+
+if __name__ == '__main__':
+    unittest.main()
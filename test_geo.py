@@ -0,0 +1,98 @@
+import json
+import unittest
+from unittest.mock import patch
+
+from geo import SeenIndex, Tile, point_in_polygon, subdivide, sweep_area, tile_area, tile_radius, tile_touches_polygon
+
+def make_page(ids, total):
+    return {'data': {'searchQueries': {'search': {
+        'pagination': {'nbResultsTotal': total},
+        'results': [{'basicPropertyData': {'id': i}} for i in ids],
+    }}}}
+
+def search_input(payload):
+    return json.loads(payload)['variables']['input']
+
+class TestTiling(unittest.TestCase):
+
+    def test_tiles_cover_box_within_radius(self):
+        """Test that tiles span the whole box and each fits inside its search circle"""
+        tiles = tile_area(25.0, 55.0, 25.3, 55.4, radius_m=3000)
+        self.assertEqual(min(t.south for t in tiles), 25.0)
+        self.assertEqual(max(t.north for t in tiles), 25.3)
+        self.assertEqual(min(t.west for t in tiles), 55.0)
+        self.assertAlmostEqual(max(t.east for t in tiles), 55.4)
+        self.assertTrue(all(tile_radius(t) <= 3001 for t in tiles))
+
+    def test_polygon_drops_outside_tiles(self):
+        """Test that only tiles touching the polygon are kept"""
+        triangle = [(25.0, 55.0), (25.3, 55.0), (25.0, 55.4)]
+        self.assertLess(len(tile_area(25.0, 55.0, 25.3, 55.4, polygon=triangle)), len(tile_area(25.0, 55.0, 25.3, 55.4)))
+        self.assertTrue(point_in_polygon(25.05, 55.05, triangle))
+        self.assertFalse(point_in_polygon(25.29, 55.39, triangle))
+
+    def test_thin_strip_crossing_tile(self):
+        """Test that a strip crossing a tile with no vertex or tile corner inside the other still touches it"""
+        tile = Tile(25.0, 55.0, 25.1, 55.1)
+        strip = [(24.9, 55.04), (25.2, 55.04), (25.2, 55.045), (24.9, 55.045)]
+        self.assertTrue(tile_touches_polygon(tile, strip))
+        self.assertFalse(tile_touches_polygon(Tile(25.0, 55.2, 25.1, 55.3), strip))
+
+    def test_subdivide_halves_radius(self):
+        """Test that quarters cover the parent with half the radius"""
+        tile = Tile(25.0, 55.0, 25.02, 55.02)
+        quarters = subdivide(tile)
+        self.assertEqual(len(quarters), 4)
+        self.assertAlmostEqual(tile_radius(quarters[0]), tile_radius(tile) / 2, delta=2)
+
+class TestSeenIndex(unittest.TestCase):
+
+    def test_add_reports_first_sighting(self):
+        """Test that an id is only new once"""
+        seen = SeenIndex([1])
+        self.assertFalse(seen.add(1))
+        self.assertTrue(seen.add(2))
+        self.assertIn(2, seen)
+        self.assertEqual(len(seen), 2)
+
+class TestSweepArea(unittest.TestCase):
+
+    @patch('geo.BookingClient')
+    @patch('geo.fetch_many')
+    def test_dense_tile_is_subdivided_and_deduplicated(self, mock_fetch_many, mock_client):
+        """Test that a capped tile is split and overlapping results are emitted once"""
+        mock_fetch_many.side_effect = [
+            [make_page([1, 2], 50)],                       # parent tile hits the cap
+            [],                                            # no extra pages at depth 0
+            [make_page([2, 3], 2)] + [make_page([3, 4], 2)] * 3,  # quarters overlap
+            [],
+        ]
+        bbox = (25.0, 55.0, 25.01, 55.01)
+
+        rows = list(sweep_area(bbox, page_size=10, result_cap=50))
+
+        self.assertEqual([row.id for row in rows], [1, 2, 3, 4])
+        quarter_payloads = mock_fetch_many.call_args_list[2][0][2]
+        self.assertEqual(len(quarter_payloads), 4)
+        distance = search_input(quarter_payloads[0])['filters']['selectedFilters']
+        self.assertLess(int(distance.split('=')[1]), 1000)
+
+    @patch('geo.BookingClient')
+    @patch('geo.fetch_many')
+    def test_sparse_tile_fetches_remaining_pages(self, mock_fetch_many, mock_client):
+        """Test that a tile under the cap is paged through instead of split"""
+        mock_fetch_many.side_effect = [[make_page([1], 25)], [make_page([2], 25), make_page([3], 25)]]
+
+        rows = list(sweep_area((25.0, 55.0, 25.01, 55.01), page_size=10, max_depth=0))
+
+        self.assertEqual([row.id for row in rows], [1, 2, 3])
+        offsets = [search_input(p)['pagination']['offset'] for p in mock_fetch_many.call_args_list[1][0][2]]
+        self.assertEqual(offsets, [10, 20])
+
+    def test_requires_area(self):
+        """Test that a sweep needs a box or polygon"""
+        with self.assertRaises(ValueError):
+            list(sweep_area())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,10 @@
+import io
+import json
 import unittest
-from unittest.mock import patch, Mock
-from listings import get_properties
+from unittest.mock import MagicMock, patch, Mock
+import listings
+from api_client import HostRateLimiter
+from listings import Listing, extract_listing_data, get_all_properties, get_properties, iter_listing_rows, stream_listings
 
 class TestGetProperties(unittest.TestCase):
     
@@ -34,7 +38,7 @@ class TestGetProperties(unittest.TestCase):
         # Verify all mocks were called correctly
         mock_headers.assert_called_once()
         mock_build_body.assert_called_once_with(
-            "Silvassa", 30, "2025-03-27", "2025-03-29", None, None
+            "Silvassa", 30, "2025-03-29", "2025-03-30", None, None
         )
         mock_fetch.assert_called_once()
         mock_extract.assert_called_once()
@@ -59,11 +63,167 @@ class TestGetProperties(unittest.TestCase):
         
         # Verify build_search_body was called with coordinates
         mock_build_body.assert_called_once_with(
-            "Bangalore", 20, "2025-03-27", "2025-03-29", 12.9716, 77.5946
+            "Bangalore", 20, "2025-03-29", "2025-03-30", 12.9716, 77.5946
         )
         
         # Verify the result
         self.assertEqual(result, [["1", "Test Property", "Test Page", "100"]])
 
+
+def make_page(ids, total):
+    return {'data': {'searchQueries': {'search': {
+        'pagination': {'nbResultsTotal': total},
+        'results': [{'basicPropertyData': {'id': i}} for i in ids],
+    }}}}
+
+class TestGetAllProperties(unittest.TestCase):
+
+    @patch('listings.BookingClient')
+    @patch('listings.fetch_many')
+    @patch('listings.fetch_from_api')
+    def test_fetches_remaining_offsets(self, mock_fetch, mock_fetch_many, mock_client):
+        """Test that the total count drives the offsets fetched after the first page"""
+        mock_fetch.return_value = make_page([1, 2], 5)
+        mock_fetch_many.return_value = [make_page([3, 4], 5), make_page([5], 5)]
+
+        result = get_all_properties("Dubai", 2, concurrency=4)
+
+        payloads = mock_fetch_many.call_args[0][2]
+        offsets = [json.loads(p)['variables']['input']['pagination']['offset'] for p in payloads]
+        self.assertEqual(offsets, [2, 4])
+        self.assertEqual([row[0] for row in result], [1, 2, 3, 4, 5])
+        mock_client.assert_called_once_with(pool_size=4)
+        mock_client.return_value.close.assert_called_once()
+
+    @patch('listings.BookingClient')
+    @patch('listings.fetch_many')
+    @patch('listings.fetch_from_api')
+    def test_single_page_skips_fan_out(self, mock_fetch, mock_fetch_many, mock_client):
+        """Test that a result set fitting in one page needs no extra requests"""
+        mock_fetch.return_value = make_page([1], 1)
+        mock_fetch_many.return_value = []
+
+        result = get_all_properties("Dubai", 10)
+
+        self.assertEqual(mock_fetch_many.call_args[0][2], [])
+        self.assertEqual(len(result), 1)
+
+    @patch('listings.BookingClient')
+    @patch('listings.fetch_many')
+    @patch('listings.fetch_from_api')
+    def test_offsets_stop_at_result_cap(self, mock_fetch, mock_fetch_many, mock_client):
+        """Test that offsets past the paging cap are never requested"""
+        mock_fetch.return_value = make_page([1], 5000)
+        mock_fetch_many.return_value = []
+
+        get_all_properties("Dubai", 100, result_cap=1000)
+
+        payloads = mock_fetch_many.call_args[0][2]
+        offsets = [json.loads(p)['variables']['input']['pagination']['offset'] for p in payloads]
+        self.assertEqual(offsets[-1], 900)
+        self.assertEqual(len(offsets), 9)
+
+    @patch('listings.BookingClient')
+    @patch('listings.fetch_many')
+    @patch('listings.fetch_from_api')
+    def test_rate_limit_covers_first_page(self, mock_fetch, mock_fetch_many, mock_client):
+        """Test that one limiter is used for the first page and the fan-out"""
+        mock_fetch.return_value = make_page([1], 1)
+        mock_fetch_many.return_value = []
+        limiter = Mock(spec=HostRateLimiter)
+
+        get_all_properties("Dubai", 10, rate_limit=limiter)
+
+        limiter.wait.assert_called_once()
+        self.assertIs(mock_fetch_many.call_args[0][4], limiter)
+
+    def test_invalid_page_size(self):
+        """Test that a non-positive page size raises ValueError"""
+        with self.assertRaises(ValueError):
+            get_all_properties("Dubai", 0)
+
+SAMPLE_RESPONSE = {'data': {'searchQueries': {'search': {
+    'banners': [{'title': 'ignored'}],
+    'results': [
+        {
+            'basicPropertyData': {'id': 11, 'pageName': 'hotel-a', 'photos': [{'url': 'x'}]},
+            'displayName': {'text': 'Hotel A'},
+            'priceDisplayInfoIrene': {'displayPrice': {'amountPerStay': {'amount': 'AED 1,200', 'amountUnformatted': 1200, 'currency': 'AED'}}},
+            'blocks': [{'id': 'nested'}],
+        },
+        {'basicPropertyData': None, 'displayName': {'text': 'No data'}},
+    ],
+}}}}
+SAMPLE_ROWS = [Listing(11, 'Hotel A', 'hotel-a', 'AED 1,200', 1200.0, 'AED'), Listing('N/A', 'No data', 'N/A', 'N/A')]
+
+ERROR_PAGE = {'data': None, 'errors': [{'message': 'Too many requests'}]}
+THROTTLED_PAGE = {'data': {'searchQueries': {'search': {'pagination': {'nbResultsTotal': 5}}}}}
+
+class TestInvalidPages(unittest.TestCase):
+    # Error and throttled pages arrive as 200s and must fail the crawl rather than read as empty pages
+
+    def crawl(self, first_page, later_page, stream=False):
+        def respond(url, headers, payload, client=None, stream=True):
+            offset = json.loads(payload)['variables']['input']['pagination']['offset']
+            body = first_page if offset == 0 else later_page
+            response = MagicMock()
+            response.json.return_value = body
+            response.raw = io.BytesIO(json.dumps(body).encode('utf-8'))
+            return response
+        with patch('api_client.stream_from_api', side_effect=respond), patch('listings.BookingClient'):
+            return get_all_properties("Dubai", 2, stream=stream)
+
+    def test_valid_pages(self):
+        """Test that well-formed pages still crawl in both modes"""
+        for stream in (False, True):
+            self.assertEqual(len(self.crawl(make_page([1, 2], 3), make_page([3], 3), stream)), 3)
+
+    def test_error_first_page(self):
+        """Test that a data: null error body raises a clear error instead of AttributeError"""
+        with self.assertRaisesRegex(ValueError, 'Too many requests'):
+            self.crawl(ERROR_PAGE, make_page([], 3))
+
+    def test_fan_out_page_without_results(self):
+        """Test that a later page missing its results list raises in both modes"""
+        for later_page in (THROTTLED_PAGE, ERROR_PAGE):
+            for stream in (False, True):
+                with self.subTest(later_page=later_page, stream=stream), self.assertRaisesRegex(ValueError, 'Not a search results page'):
+                    self.crawl(make_page([1, 2], 3), later_page, stream)
+
+    @patch('listings.ijson', None)
+    def test_fallback_parser_checks_page(self):
+        """Test that the json.load fallback rejects the same pages"""
+        with self.assertRaises(ValueError):
+            list(iter_listing_rows(io.BytesIO(json.dumps(THROTTLED_PAGE).encode('utf-8'))))
+
+class TestStreamingExtraction(unittest.TestCase):
+
+    def sample_stream(self):
+        return io.BytesIO(json.dumps(SAMPLE_RESPONSE).encode('utf-8'))
+
+    def test_extract_listing_data(self):
+        """Test that the kept fields are read with N/A or None defaults"""
+        self.assertEqual(extract_listing_data(SAMPLE_RESPONSE), SAMPLE_ROWS)
+
+    @unittest.skipIf(listings.ijson is None, 'ijson not installed')
+    def test_incremental_parser_matches_extract(self):
+        """Test that the event parser yields the same rows as the dict path"""
+        self.assertEqual(list(iter_listing_rows(self.sample_stream())), SAMPLE_ROWS)
+
+    @patch('listings.ijson', None)
+    def test_fallback_without_ijson(self):
+        """Test that streaming still works when ijson is unavailable"""
+        self.assertEqual(list(iter_listing_rows(self.sample_stream())), SAMPLE_ROWS)
+
+    @patch('listings.stream_from_api')
+    def test_stream_listings_closes_response(self, mock_stream):
+        """Test that the streamed response is read from raw and closed afterwards"""
+        response = MagicMock()
+        response.raw = self.sample_stream()
+        mock_stream.return_value = response
+
+        self.assertEqual(list(stream_listings(b'{}')), SAMPLE_ROWS)
+        response.__exit__.assert_called_once()
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
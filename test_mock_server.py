@@ -0,0 +1,62 @@
+import unittest
+
+import requests
+
+import timing
+from api_client import BookingClient, get_payload_builder
+from geo import sweep_area
+from listings import CHECK_IN, CHECK_OUT, get_all_properties, stream_listings
+from mock_server import MockBookingServer
+
+class TestAgainstMockServer(unittest.TestCase):
+    # End-to-end runs over real HTTP against the local stand-in server
+
+    def setUp(self):
+        self.server = MockBookingServer(total_results=95, padding=2).start()
+        self.addCleanup(self.server.stop)
+
+    def test_get_all_properties_collects_every_page(self):
+        """Test that all pages are fetched once and come back in offset order"""
+        with BookingClient(headers={}, pool_size=4) as client:
+            rows = get_all_properties('Dubai', 10, concurrency=4, client=client, url=self.server.url)
+            stats = client.stats()
+
+        self.assertEqual([row.id for row in rows], [1000000 + i for i in range(95)])
+        self.assertEqual(self.server.requests, 10)
+        self.assertGreater(stats['reused'], 0)
+
+    def test_streaming_mode_matches_decoded_pages(self):
+        """Test that stream=True parses the fan-out pages off the socket with the same result"""
+        decoded = get_all_properties('Dubai', 10, concurrency=4, url=self.server.url)
+        streamed = get_all_properties('Dubai', 10, concurrency=4, url=self.server.url, stream=True)
+        self.assertEqual(streamed, decoded)
+
+    def test_trimmed_payload_and_streaming(self):
+        """Test that pre-serialized payloads and the streaming parser work over HTTP"""
+        payload = get_payload_builder(trimmed=True).build('Dubai', 20, CHECK_IN, CHECK_OUT, offset=90)
+        rows = list(stream_listings(payload, url=self.server.url))
+        self.assertEqual([row.amount for row in rows][:1], ['AED 730'])
+        self.assertEqual(len(rows), 5)
+
+    def test_sweep_area_deduplicates_tiles(self):
+        """Test that overlapping tiles returning the same listings yield each once"""
+        rows = list(sweep_area((25.0, 55.0, 25.05, 55.05), page_size=50, radius_m=2000, url=self.server.url))
+        self.assertEqual(len(rows), 95)
+
+    def test_timing_covers_request_stages(self):
+        """Test that a real run records build, network, decode and extract timings"""
+        timing.reset()
+        timing.enable()
+        self.addCleanup(timing.disable)
+        self.addCleanup(timing.reset)
+
+        get_all_properties('Dubai', 50, url=self.server.url)
+
+        self.assertLessEqual({'build', 'network', 'decode', 'extract'}, set(timing.snapshot()))
+
+    def test_bad_payload_rejected(self):
+        """Test that the server answers non-search bodies with 400"""
+        self.assertEqual(requests.post(self.server.url, data=b'{}', timeout=5).status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+
+import sinks
+from listings import Listing
+from sinks import CsvSink, JsonlSink, open_sink, parse_amount, typed_record
+
+ROWS = [Listing(11, 'Hotel A', 'hotel-a', 'AED 1,200', 1200.0, 'AED'), Listing(12, 'Hotel B', 'hotel-b', 'US$99.50')]
+
+class TestParseAmount(unittest.TestCase):
+
+    def test_display_strings(self):
+        """Test that currency prefixes and thousands separators are handled"""
+        self.assertEqual(parse_amount('AED 1,200'), (1200.0, 'AED'))
+        self.assertEqual(parse_amount('US$99.50'), (99.5, 'US$'))
+        self.assertEqual(parse_amount('₹ 12,345'), (12345.0, '₹'))
+
+    def test_missing_amount(self):
+        """Test that placeholders parse to no value"""
+        self.assertEqual(parse_amount('N/A'), (None, None))
+        self.assertEqual(parse_amount(None), (None, None))
+
+    def test_unrecognised_formats(self):
+        """Test that prices outside the en-gb format are not guessed at"""
+        self.assertEqual(parse_amount('€1.234,50'), (None, None))
+        self.assertEqual(parse_amount('kr 1 234'), (None, None))
+        self.assertEqual(parse_amount('AED 1,2'), (None, None))
+        self.assertEqual(parse_amount('From AED 100 per night'), (None, None))
+
+    def test_unformatted_amount_preferred(self):
+        """Test that the API's unformatted amount and currency win over the display string"""
+        record = typed_record(Listing(1, 'A', 'a', '€1.234,50', 1234.5, 'EUR'))
+        self.assertEqual((record['amount_value'], record['currency']), (1234.5, 'EUR'))
+        record = typed_record(Listing(2, 'B', 'b', 'kr 1 234', None, 'NOK'))
+        self.assertEqual((record['amount_value'], record['currency']), (None, 'NOK'))
+
+class TestSinks(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def test_csv_append_writes_header_once(self):
+        """Test that appending to an existing CSV does not repeat the header"""
+        for row in ROWS:
+            with CsvSink(self.path('out.csv')) as sink:
+                sink.write(row)
+        with open(self.path('out.csv'), newline='') as f:
+            lines = list(csv.reader(f))
+        self.assertEqual(lines[0], sinks.CSV_HEADERS)
+        self.assertEqual([line[0] for line in lines[1:]], ['11', '12'])
+        self.assertEqual(len(lines[1]), len(sinks.CSV_HEADERS))
+
+    def test_buffer_flushes_in_batches(self):
+        """Test that rows are written once the buffer fills"""
+        sink = JsonlSink(self.path('out.jsonl'), buffer_rows=2)
+        sink.write(ROWS[0])
+        self.assertEqual(sink.rows_written, 0)
+        sink.write(ROWS[1])
+        self.assertEqual(sink.rows_written, 2)
+        sink.close()
+
+    def test_jsonl_typed_records(self):
+        """Test that JSONL rows carry a numeric amount and currency"""
+        with open_sink(self.path('out.jsonl')) as sink:
+            sink.write_rows(ROWS)
+        with open(self.path('out.jsonl'), encoding='utf-8') as f:
+            first = json.loads(f.readline())
+        self.assertEqual(first['listing_id'], 11)
+        self.assertEqual((first['amount_value'], first['currency']), (1200.0, 'AED'))
+
+    @unittest.skipIf(sinks.pa is None, 'pyarrow not installed')
+    def test_parquet_row_groups(self):
+        """Test that each buffered batch becomes a typed row group"""
+        with open_sink(self.path('out.parquet'), buffer_rows=1) as sink:
+            sink.write_rows(ROWS + [Listing('N/A', 'No data', 'N/A', 'N/A')])
+        parquet = sinks.pq.ParquetFile(self.path('out.parquet'))
+        self.assertEqual(parquet.num_row_groups, 3)
+        table = parquet.read()
+        self.assertEqual(table.column('amount_value').to_pylist(), [1200.0, 99.5, None])
+        self.assertEqual(table.column('listing_id').to_pylist(), [11, 12, None])
+
+    @unittest.skipIf(sinks.pa is None, 'pyarrow not installed')
+    def test_parquet_refuses_append(self):
+        """Test that appending to an existing Parquet file raises instead of overwriting it"""
+        with open_sink(self.path('out.parquet')) as sink:
+            sink.write_rows(ROWS)
+        with self.assertRaises(ValueError):
+            open_sink(self.path('out.parquet'), append=True)
+        self.assertEqual(sinks.pq.ParquetFile(self.path('out.parquet')).metadata.num_rows, 2)
+
+    def test_unknown_format(self):
+        """Test that an unsupported extension raises ValueError"""
+        with self.assertRaises(ValueError):
+            open_sink(self.path('out.xlsx'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+
+import timing
+
+class TestTiming(unittest.TestCase):
+
+    def setUp(self):
+        timing.reset()
+        self.addCleanup(timing.disable)
+        self.addCleanup(timing.reset)
+
+    def test_disabled_records_nothing(self):
+        """Test that stages are free no-ops until timing is enabled"""
+        with timing.stage('build'):
+            pass
+        self.assertEqual(timing.snapshot(), {})
+
+    def test_histogram_buckets(self):
+        """Test that samples land in the bucket for their latency"""
+        timing.enable()
+        with timing.stage('build'):
+            pass
+        timing.record('network', 0.015)
+        timing.record('network', 3)
+
+        stats = timing.snapshot()
+        self.assertEqual(stats['build']['count'], 1)
+        self.assertEqual(stats['network']['buckets'][timing.BUCKETS_MS.index(20)], 1)
+        self.assertEqual(stats['network']['buckets'][-1], 0)
+        self.assertEqual(timing.percentile(stats['network'], 0.5), 20)
+        self.assertEqual(timing.percentile(stats['network'], 0.95), 3000)
+
+    def test_sub_millisecond_buckets(self):
+        """Test that fast stages are spread over the sub-millisecond buckets"""
+        timing.record('build', 0.00003)
+        timing.record('build', 0.00015)
+        timing.record('build', 0.0004)
+
+        stats = timing.snapshot()['build']
+        self.assertEqual(stats['buckets'][:4], [1, 0, 1, 1])
+        self.assertEqual(timing.percentile(stats, 0.5), 0.2)
+
+    def test_drain_and_merge(self):
+        """Test that worker timings can be shipped back and combined"""
+        timing.record('write', 0.001)
+        drained = timing.drain()
+        self.assertEqual(timing.snapshot(), {})
+
+        timing.record('write', 0.002)
+        timing.merge(drained)
+        self.assertEqual(timing.snapshot()['write']['count'], 2)
+        self.assertIn('write', timing.report())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds of the histogram buckets in milliseconds, the last bucket catches everything slower.
+# The sub-millisecond buckets keep build/extract/write apart, since those usually finish well under 1 ms
+BUCKETS_MS = (0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+STAGES = ('build', 'network', 'decode', 'extract', 'stream', 'write')
+
+_enabled = False
+_stats = {}
+_lock = threading.Lock()
+
+def enable():
+    global _enabled
+    _enabled = True
+
+def disable():
+    global _enabled
+    _enabled = False
+
+def is_enabled():
+    return _enabled
+
+def _empty():
+    return {'count': 0, 'total': 0.0, 'max': 0.0, 'buckets': [0] * (len(BUCKETS_MS) + 1)}
+
+def record(name, seconds):
+    ms = seconds * 1000
+    with _lock:
+        stats = _stats.setdefault(name, _empty())
+        stats['count'] += 1
+        stats['total'] += ms
+        stats['max'] = max(stats['max'], ms)
+        stats['buckets'][bisect.bisect_left(BUCKETS_MS, ms)] += 1
+
+@contextmanager
+def stage(name):
+    #Times the enclosed block under `name`; costs a flag check when timing is off
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+def snapshot():
+    with _lock:
+        return {name: dict(stats, buckets=list(stats['buckets'])) for name, stats in _stats.items()}
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+def drain():
+    # Snapshot and reset in one go, used to ship worker timings back to the parent process
+    with _lock:
+        stats = dict(_stats)
+        _stats.clear()
+    return stats
+
+def merge(other):
+    with _lock:
+        for name, incoming in other.items():
+            stats = _stats.setdefault(name, _empty())
+            stats['count'] += incoming['count']
+            stats['total'] += incoming['total']
+            stats['max'] = max(stats['max'], incoming['max'])
+            stats['buckets'] = [a + b for a, b in zip(stats['buckets'], incoming['buckets'])]
+
+def percentile(stats, fraction):
+    # Upper bound of the bucket holding the given fraction of samples
+    target = stats['count'] * fraction
+    seen = 0
+    for bound, count in zip(BUCKETS_MS + (float('inf'),), stats['buckets']):
+        seen += count
+        if seen >= target:
+            return min(bound, stats['max'])
+    return stats['max']
+
+def report():
+    #Per-stage latency table (milliseconds); p50/p95 are histogram bucket bounds
+    stats = snapshot()
+    names = [name for name in STAGES if name in stats] + sorted(set(stats) - set(STAGES))
+    lines = [f"{'stage':<10}{'count':>8}{'mean':>10}{'p50':>10}{'p95':>10}{'max':>10}"]
+    for name in names:
+        s = stats[name]
+        lines.append(
+            f"{name:<10}{s['count']:>8}{s['total'] / s['count']:>10.2f}"
+            f"{percentile(s, 0.5):>10.2f}{percentile(s, 0.95):>10.2f}{s['max']:>10.2f}"
+        )
+    return '\n'.join(lines)